@@ -3,78 +3,604 @@ Real-time shopper event data generator
 Simulates e-commerce user interactions for analytics pipeline
 """
 
-import json
+import asyncio
+import multiprocessing as mp
+import os
 import random
 import time
+import zlib
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import boto3
+from botocore.config import Config
+import numpy as np
+import msgspec
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard as zstd
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
 from faker import Faker
 
 fake = Faker()
 
+EPOCH = datetime(1970, 1, 1)
+
+# Kinesis PutRecords limits: 500 records and 5 MiB per request, 1 MiB per record
+MAX_BATCH_RECORDS = 500
+MAX_BATCH_BYTES = int(4.5 * 1024 * 1024)
+MAX_RECORD_BYTES = 1024 * 1024
+MAX_PUT_RETRIES = 5
+
+# Keep-alive connection pool and adaptive client-side rate limiting for throttled shards
+KINESIS_RETRIES = {'max_attempts': 10, 'mode': 'adaptive'}
+KINESIS_MAX_POOL_CONNECTIONS = 50
+
+# Compressed record format: 1-byte version header + zstd-compressed JSON array of events
+RECORD_VERSION_ZSTD_BATCH = b'\x01'
+EVENTS_PER_RECORD = 100
+MAX_PENDING_EVENTS = 5000
+
+# Compressed records are grouped by user_id hash bucket; a user always maps to the same
+# bucket (and so the same shard) while each bucket collects enough events to fill records
+PARTITION_BUCKETS = 32
+ZSTD_LEVEL = 3
+
+# Size of the pre-sampled Faker pools used for bulk generation
+LOCATION_POOL_SIZE = 10000
+
+# Smallest sub-batch worth shipping to a pool worker; smaller batches stay in-process
+MIN_EVENTS_PER_PROCESS = 10000
+
+# Columnar layout of a generated event batch (location fields flattened)
+EVENT_ARROW_SCHEMA = pa.schema([
+    ('event_id', pa.string()),
+    ('user_id', pa.string()),
+    ('session_id', pa.string()),
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('event_type', pa.string()),
+    ('product_id', pa.string()),
+    ('category', pa.string()),
+    ('price', pa.float64()),
+    ('device_type', pa.string()),
+    ('country', pa.string()),
+    ('city', pa.string()),
+    ('ip_address', pa.string()),
+    ('ad_campaign_id', pa.string()),
+    ('revenue', pa.float64()),
+])
+
+
+class Location(msgspec.Struct):
+    country: str
+    city: str
+    ip_address: str
+
+
+class ShopperEvent(msgspec.Struct):
+    """Fixed shopper event schema; msgspec compiles its JSON encoder/decoder once"""
+    event_id: str
+    user_id: str
+    session_id: str
+    timestamp: datetime
+    event_type: str
+    product_id: str
+    category: str
+    price: float
+    device_type: str
+    location: Location
+    ad_campaign_id: Optional[str]
+    revenue: float
+
+
+EVENT_ENCODER = msgspec.json.Encoder()
+EVENT_DECODER = msgspec.json.Decoder(ShopperEvent)
+EVENT_BATCH_DECODER = msgspec.json.Decoder(List[ShopperEvent])
+
+
+def _failed_records(records: List[Dict], response: Dict) -> List[Dict]:
+    """Return the records put_records reported as failed (results keep request order)"""
+    return [
+        record for record, result in zip(records, response['Records'])
+        if 'ErrorCode' in result
+    ]
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Jittered exponential backoff, capped at 5 seconds"""
+    return min(0.1 * 2 ** attempt, 5) * random.uniform(0.5, 1.0)
+
+
+def random_ids(count: int) -> List[str]:
+    """Generate count random 128-bit hex IDs from a single os.urandom call"""
+    raw = os.urandom(16 * count).hex()
+    return [raw[i:i + 32] for i in range(0, len(raw), 32)]
+
+
+def encode_event_batch(events: List[ShopperEvent], cctx: zstd.ZstdCompressor) -> bytes:
+    """Pack several events into one compressed Kinesis record payload"""
+    return RECORD_VERSION_ZSTD_BATCH + cctx.compress(EVENT_ENCODER.encode(events))
+
+
+def decode_record(data: bytes) -> List[ShopperEvent]:
+    """Decode and validate a Kinesis record payload, either a compressed batch or a single JSON event"""
+    if data[:1] == RECORD_VERSION_ZSTD_BATCH:
+        return EVENT_BATCH_DECODER.decode(zstd.ZstdDecompressor().decompress(data[1:]))
+    return [EVENT_DECODER.decode(data)]
+
+
+def _generate_events_frame(rng: np.random.Generator, pools: Dict[str, List[str]],
+                           timestamp: datetime, count: int) -> pd.DataFrame:
+    """Draw count events column-wise from the given value pools"""
+    event_types = rng.choice(pools['event_type'], count)
+    is_purchase = event_types == 'purchase'
+    
+    campaigns = np.char.add('campaign_', rng.integers(1, 101, count).astype(str)).astype(object)
+    campaigns[rng.random(count) <= 0.7] = None
+    
+    ids = random_ids(2 * count)
+    
+    return pd.DataFrame({
+        'event_id': ids[:count],
+        'user_id': np.char.add('user_', rng.integers(1000, 100000, count).astype(str)),
+        'session_id': ids[count:],
+        'timestamp': timestamp,
+        'event_type': event_types,
+        'product_id': np.char.add('prod_', rng.integers(1, 10001, count).astype(str)),
+        'category': rng.choice(pools['category'], count),
+        'price': np.round(rng.uniform(10, 500, count), 2),
+        'device_type': rng.choice(pools['device_type'], count),
+        'country': rng.choice(pools['country'], count),
+        'city': rng.choice(pools['city'], count),
+        'ip_address': rng.choice(pools['ip_address'], count),
+        'ad_campaign_id': campaigns,
+        'revenue': np.where(is_purchase, np.round(rng.uniform(0, 500, count), 2), 0.0),
+    })
+
+
+def _frame_to_events(df: pd.DataFrame, timestamp: datetime) -> List[ShopperEvent]:
+    """Assemble ShopperEvent structs from a generated events frame (every row shares timestamp)"""
+    columns = {name: df[name].tolist() for name in df.columns if name != 'timestamp'}
+    return [
+        ShopperEvent(
+            event_id=event_id,
+            user_id=user_id,
+            session_id=session_id,
+            timestamp=timestamp,
+            event_type=event_type,
+            product_id=product_id,
+            category=category,
+            price=price,
+            device_type=device_type,
+            location=Location(country=country, city=city, ip_address=ip_address),
+            ad_campaign_id=ad_campaign_id,
+            revenue=revenue
+        )
+        for (event_id, user_id, session_id, event_type, product_id, category,
+             price, device_type, country, city, ip_address, ad_campaign_id, revenue)
+        in zip(*columns.values())
+    ]
+
+
+class _EventPacker:
+    """Groups events by partition bucket and packs each group into one compressed record,
+    so a user's events stay on a single shard and in order"""
+    
+    def __init__(self, cctx: zstd.ZstdCompressor):
+        self._cctx = cctx
+        self._groups = {}
+        self._count = 0
+    
+    def _pack(self, partition_key: str, events: List[ShopperEvent]) -> Tuple[bytes, str]:
+        return encode_event_batch(events, self._cctx), partition_key
+    
+    def add(self, event: ShopperEvent) -> List[Tuple[bytes, str]]:
+        """Add an event; returns any records that became ready"""
+        partition_key = f"bucket_{zlib.crc32(event.user_id.encode()) % PARTITION_BUCKETS}"
+        group = self._groups.setdefault(partition_key, [])
+        group.append(event)
+        self._count += 1
+        
+        if len(group) >= EVENTS_PER_RECORD:
+            del self._groups[partition_key]
+            self._count -= len(group)
+            return [self._pack(partition_key, group)]
+        
+        # Bound memory held in partially filled groups
+        if self._count >= MAX_PENDING_EVENTS:
+            return self.drain()
+        return []
+    
+    def drain(self) -> List[Tuple[bytes, str]]:
+        """Pack every pending group, however small"""
+        records = [self._pack(key, events) for key, events in self._groups.items()]
+        self._groups = {}
+        self._count = 0
+        return records
+
+
 class ShopperEventGenerator:
-    def __init__(self):
-        self.kinesis = boto3.client('kinesis')
+    def __init__(self, compress: bool = False):
+        self.kinesis = boto3.client('kinesis', config=Config(
+            retries=KINESIS_RETRIES,
+            max_pool_connections=KINESIS_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True
+        ))
+        self.s3 = boto3.client('s3')
         self.stream_name = 'shopper-events-stream'
         
+        # Pending records for the next put_records call
+        self._buffer = []
+        self._buffer_bytes = 0
+        
+        # Optionally pack up to EVENTS_PER_RECORD events per partition bucket into zstd-compressed records
+        self.compress = compress
+        self._cctx = zstd.ZstdCompressor(level=ZSTD_LEVEL)
+        self._packer = _EventPacker(self._cctx)
+        
         # Product categories for realistic simulation
         self.categories = ['Electronics', 'Clothing', 'Books', 'Home', 'Sports']
         self.event_types = ['page_view', 'add_to_cart', 'purchase', 'search', 'ad_click']
+        self.device_types = ['mobile', 'desktop', 'tablet']
+        
+        # Vectorized RNG and pre-materialized Faker pools (Faker calls cost 10-50us each)
+        self._seed = np.random.SeedSequence().entropy
+        self._rng = np.random.default_rng(self._seed)
+        self._countries = [fake.country_code() for _ in range(LOCATION_POOL_SIZE)]
+        self._cities = [fake.city() for _ in range(LOCATION_POOL_SIZE)]
+        self._ips = [fake.ipv4() for _ in range(LOCATION_POOL_SIZE)]
+        self._pools = {
+            'category': self.categories,
+            'event_type': self.event_types,
+            'device_type': self.device_types,
+            'country': self._countries,
+            'city': self._cities,
+            'ip_address': self._ips,
+        }
+        
+        # Worker pool for parallel batch generation, kept between calls only inside a with block
+        self._process_pool = None
+        self._process_pool_size = None
+        self._in_context = False
         
-    def generate_shopper_event(self) -> Dict:
+        # Millisecond timestamp cache shared by events generated in the same tick
+        self._ts_ms = None
+        self._ts = None
+        
+    def _current_timestamp(self) -> datetime:
+        """UTC time quantized to 1 ms, reused for every event in the same millisecond"""
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms != self._ts_ms:
+            self._ts_ms = now_ms
+            self._ts = EPOCH + timedelta(milliseconds=now_ms)
+        return self._ts
+    
+    def generate_shopper_event(self) -> ShopperEvent:
         """Generate realistic shopper behavior event"""
         user_id = f"user_{random.randint(1000, 99999)}"
-        session_id = fake.uuid4()
-        
-        event = {
-            'event_id': fake.uuid4(),
-            'user_id': user_id,
-            'session_id': session_id,
-            'timestamp': datetime.utcnow().isoformat(),
-            'event_type': random.choice(self.event_types),
-            'product_id': f"prod_{random.randint(1, 10000)}",
-            'category': random.choice(self.categories),
-            'price': round(random.uniform(10, 500), 2),
-            'device_type': random.choice(['mobile', 'desktop', 'tablet']),
-            'location': {
-                'country': fake.country_code(),
-                'city': fake.city(),
-                'ip_address': fake.ipv4()
-            },
-            'ad_campaign_id': f"campaign_{random.randint(1, 100)}" if random.random() > 0.7 else None,
-            'revenue': round(random.uniform(0, 500), 2) if random.choice(self.event_types) == 'purchase' else 0
-        }
+        event_id, session_id = random_ids(2)
+        event_type = random.choice(self.event_types)
+        
+        event = ShopperEvent(
+            event_id=event_id,
+            user_id=user_id,
+            session_id=session_id,
+            timestamp=self._current_timestamp(),
+            event_type=event_type,
+            product_id=f"prod_{random.randint(1, 10000)}",
+            category=random.choice(self.categories),
+            price=round(random.uniform(10, 500), 2),
+            device_type=random.choice(self.device_types),
+            location=Location(
+                country=random.choice(self._countries),
+                city=random.choice(self._cities),
+                ip_address=random.choice(self._ips)
+            ),
+            ad_campaign_id=f"campaign_{random.randint(1, 100)}" if random.random() > 0.7 else None,
+            # Revenue only applies to the event's own purchase type
+            revenue=round(random.uniform(0, 500), 2) if event_type == 'purchase' else 0.0
+        )
         
         return event
     
-    def send_to_kinesis(self, event: Dict):
-        """Send event to Kinesis stream"""
+    def _add_record(self, data: bytes, partition_key: str):
+        """Buffer an encoded record, flushing when the batch limits are reached"""
+        record_size = len(data) + len(partition_key)
+        if record_size > MAX_RECORD_BYTES:
+            print(f"Dropping record: {record_size} bytes exceeds Kinesis record limit")
+            return None
+        
+        response = None
+        if self._buffer_bytes + record_size > MAX_BATCH_BYTES:
+            response = self.flush()
+        
+        self._buffer.append({'Data': data, 'PartitionKey': partition_key})
+        self._buffer_bytes += record_size
+        
+        if len(self._buffer) >= MAX_BATCH_RECORDS:
+            response = self.flush()
+        return response
+    
+    def send_to_kinesis(self, event: ShopperEvent):
+        """Send a single event to Kinesis immediately"""
         try:
             response = self.kinesis.put_record(
                 StreamName=self.stream_name,
-                Data=json.dumps(event),
-                PartitionKey=event['user_id']
+                Data=EVENT_ENCODER.encode(event),
+                PartitionKey=event.user_id
             )
-            print(f"Sent event {event['event_id']} to Kinesis")
+            print(f"Sent event {event.event_id} to Kinesis")
             return response
         except Exception as e:
             print(f"Error sending to Kinesis: {e}")
     
-    def generate_batch_events(self, count: int = 1000):
-        """Generate batch of events for testing"""
-        events = []
-        for _ in range(count):
-            event = self.generate_shopper_event()
-            events.append(event)
+    def buffer_event(self, event: ShopperEvent):
+        """Buffer event for put_records; call flush() or close() to send the tail"""
+        if not self.compress:
+            return self._add_record(EVENT_ENCODER.encode(event), event.user_id)
+        
+        response = None
+        for data, partition_key in self._packer.add(event):
+            response = self._add_record(data, partition_key) or response
+        return response
+    
+    def send_batch_to_kinesis(self, events: List[ShopperEvent]):
+        """Send a list of events to Kinesis using batched put_records calls"""
+        for event in events:
+            self.buffer_event(event)
+        return self.flush()
+    
+    def flush(self):
+        """Send buffered records, retrying only the failed ones with backoff"""
+        for data, partition_key in self._packer.drain():
+            self._add_record(data, partition_key)
+        
+        records = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        if not records:
+            return None
+        
+        total = len(records)
+        response = None
+        for attempt in range(MAX_PUT_RETRIES + 1):
+            try:
+                response = self.kinesis.put_records(
+                    StreamName=self.stream_name,
+                    Records=records
+                )
+            except Exception as e:
+                print(f"Error sending to Kinesis: {e}")
+            else:
+                if response['FailedRecordCount'] == 0:
+                    break
+                records = _failed_records(records, response)
+            
+            if attempt < MAX_PUT_RETRIES:
+                time.sleep(_backoff_delay(attempt))
+        else:
+            print(f"Failed to send {len(records)} records to Kinesis after {MAX_PUT_RETRIES} retries")
+            return response
+        
+        print(f"Sent batch of {total} records to Kinesis")
+        return response
+    
+    def close(self):
+        """Send any events still buffered and shut down the generation pool"""
+        self._close_process_pool()
+        return self.flush()
+    
+    def __enter__(self):
+        self._in_context = True
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._in_context = False
+        self.close()
+    
+    def generate_events_frame(self, count: int = 1000) -> pd.DataFrame:
+        """Generate count events column-wise with NumPy instead of per-event calls"""
+        return _generate_events_frame(self._rng, self._pools, self._current_timestamp(), count)
+    
+    def generate_record_batch(self, count: int = 1000) -> pa.RecordBatch:
+        """Generate count events as a columnar Arrow record batch"""
+        df = self.generate_events_frame(count)
+        df['timestamp'] = df['timestamp'].dt.tz_localize('UTC')
+        return pa.RecordBatch.from_pandas(df, schema=EVENT_ARROW_SCHEMA, preserve_index=False)
+    
+    def write_batch_to_s3(self, bucket: str, prefix: str, count: int = 1000):
+        """Generate a batch and upload it to S3 as a snappy-compressed Parquet file under
+        prefix/date=YYYY-MM-DD/, a Parquet root of its own (not the compacted raw path)"""
+        batch = self.generate_record_batch(count)
+        
+        # Every row shares one timestamp, so the whole file belongs to a single date partition
+        day = batch.column('timestamp')[0].as_py().date() if batch.num_rows else self._current_timestamp().date()
+        key = f"{prefix.strip('/')}/date={day.isoformat()}/{random_ids(1)[0]}.parquet".lstrip('/')
+        
+        table = pa.Table.from_batches([batch])
+        buffer = pa.BufferOutputStream()
+        pq.write_table(table, buffer, compression='snappy')
+        
+        response = self.s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=buffer.getvalue().to_pybytes()
+        )
+        print(f"Wrote {table.num_rows} events to s3://{bucket}/{key}")
+        return response
+    
+    def _get_process_pool(self, processes: int):
+        """Reuse one worker pool; workers receive the pools and seed instead of building a generator"""
+        if self._process_pool is None or self._process_pool_size != processes:
+            self._close_process_pool()
+            self._process_pool = mp.Pool(processes, initializer=_init_worker, initargs=(self._pools, self._seed))
+            self._process_pool_size = processes
+        return self._process_pool
+    
+    def _close_process_pool(self):
+        if self._process_pool is not None:
+            self._process_pool.close()
+            self._process_pool.join()
+            self._process_pool = None
+    
+    def generate_batch_events(self, count: int = 1000, send: bool = False, processes: Optional[int] = None):
+        """Generate batch of events for testing, split across processes (default: every CPU).
+        
+        Use the generator as a context manager to keep the worker pool between calls;
+        otherwise the pool is shut down after each call.
+        """
+        processes = min(processes or mp.cpu_count(), -(-count // MIN_EVENTS_PER_PROCESS))
+        if count == 0:
+            events, payload = [], b'[]'
+        elif processes == 1:
+            timestamp = self._current_timestamp()
+            df = _generate_events_frame(self._rng, self._pools, timestamp, count)
+            events = _frame_to_events(df, timestamp)
+            payload = EVENT_ENCODER.encode(events)
+        else:
+            # Workers generate, assemble and encode their chunk; the parent only decodes
+            # (validating against the schema in C) and splices the JSON arrays
+            chunk_sizes = [count // processes + (i < count % processes) for i in range(processes)]
+            try:
+                chunks = self._get_process_pool(processes).map(_generate_encoded_chunk, chunk_sizes)
+            finally:
+                if not self._in_context:
+                    self._close_process_pool()
+            events = [event for chunk in chunks for event in EVENT_BATCH_DECODER.decode(chunk)]
+            payload = b'[' + b','.join(chunk[1:-1] for chunk in chunks) + b']'
+        
+        if send:
+            self.send_batch_to_kinesis(events)
             
         # Save to local file for testing
-        with open('sample_events.json', 'w') as f:
-            json.dump(events, f, indent=2)
+        with open('sample_events.json', 'wb') as f:
+            f.write(msgspec.json.format(payload, indent=2))
         
         print(f"Generated {count} sample events")
         return events
 
+
+# Per-process state for the batch generation pool
+_worker_rng = None
+_worker_pools = None
+
+
+def _init_worker(pools: Dict[str, List[str]], seed: int):
+    """Share the parent's value pools; mix the pid into the seed so workers draw distinct streams"""
+    global _worker_rng, _worker_pools
+    _worker_rng = np.random.default_rng([seed, os.getpid()])
+    _worker_pools = pools
+
+
+def _generate_encoded_chunk(count: int) -> bytes:
+    """Generate one sub-batch in a pool worker and return it as a JSON array"""
+    timestamp = EPOCH + timedelta(milliseconds=time.time_ns() // 1_000_000)
+    df = _generate_events_frame(_worker_rng, _worker_pools, timestamp, count)
+    return EVENT_ENCODER.encode(_frame_to_events(df, timestamp))
+
+
+class AsyncShopperEventGenerator(ShopperEventGenerator):
+    """Streams events with several concurrent put_records calls in flight"""
+    
+    def __init__(self, num_workers: int = 4, max_in_flight: int = 8, compress: bool = False):
+        super().__init__(compress)
+        self.num_workers = num_workers
+        self.max_in_flight = max_in_flight
+    
+    async def _produce(self, queues: List[asyncio.Queue], count: int):
+        """Generate events, routing each user to a fixed worker to keep shard affinity"""
+        for _ in range(count):
+            event = self.generate_shopper_event()
+            worker = zlib.crc32(event.user_id.encode()) % len(queues)
+            await queues[worker].put(event)
+        
+        for queue in queues:
+            await queue.put(None)
+    
+    async def _put_batch(self, client, records: List[Dict], semaphore: asyncio.Semaphore):
+        """Send one batch, retrying only the failed records with backoff"""
+        total = len(records)
+        for attempt in range(MAX_PUT_RETRIES + 1):
+            try:
+                async with semaphore:
+                    response = await client.put_records(
+                        StreamName=self.stream_name,
+                        Records=records
+                    )
+            except Exception as e:
+                print(f"Error sending to Kinesis: {e}")
+            else:
+                if response['FailedRecordCount'] == 0:
+                    return total
+                records = _failed_records(records, response)
+            
+            if attempt < MAX_PUT_RETRIES:
+                await asyncio.sleep(_backoff_delay(attempt))
+        
+        print(f"Failed to send {len(records)} records to Kinesis after {MAX_PUT_RETRIES} retries")
+        return total - len(records)
+    
+    async def _consume(self, client, queue: asyncio.Queue, semaphore: asyncio.Semaphore):
+        """Pull events off the queue and ship them in put_records-sized batches"""
+        sent = 0
+        records = []
+        batch_bytes = 0
+        packer = _EventPacker(self._cctx)
+        while True:
+            event = await queue.get()
+            if event is None:
+                # Pack any leftover events before stopping
+                ready = packer.drain()
+            elif self.compress:
+                ready = packer.add(event)
+            else:
+                ready = [(EVENT_ENCODER.encode(event), event.user_id)]
+            
+            for data, partition_key in ready:
+                record_size = len(data) + len(partition_key)
+                if record_size > MAX_RECORD_BYTES:
+                    print(f"Dropping record: {record_size} bytes exceeds Kinesis record limit")
+                    continue
+                
+                if batch_bytes + record_size > MAX_BATCH_BYTES:
+                    sent += await self._put_batch(client, records, semaphore)
+                    records, batch_bytes = [], 0
+                
+                records.append({'Data': data, 'PartitionKey': partition_key})
+                batch_bytes += record_size
+                
+                if len(records) >= MAX_BATCH_RECORDS:
+                    sent += await self._put_batch(client, records, semaphore)
+                    records, batch_bytes = [], 0
+            
+            if event is None:
+                break
+        
+        if records:
+            sent += await self._put_batch(client, records, semaphore)
+        return sent
+    
+    async def stream_events(self, count: int = 1000) -> int:
+        """Generate and send count events to Kinesis concurrently"""
+        queues = [asyncio.Queue(maxsize=MAX_BATCH_RECORDS * 2) for _ in range(self.num_workers)]
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        
+        session = get_session()
+        config = AioConfig(
+            retries=KINESIS_RETRIES,
+            max_pool_connections=max(KINESIS_MAX_POOL_CONNECTIONS, self.max_in_flight)
+        )
+        async with session.create_client('kinesis', config=config) as client:
+            results = await asyncio.gather(
+                self._produce(queues, count),
+                *[self._consume(client, queue, semaphore) for queue in queues]
+            )
+        
+        sent = sum(results[1:])
+        print(f"Sent {sent} Kinesis records for {count} events")
+        return sent
+
 if __name__ == "__main__":
-    generator = ShopperEventGenerator()
-    generator.generate_batch_events(1000)
\ No newline at end of file
+    with ShopperEventGenerator() as generator:
+        generator.generate_batch_events(1000)
\ No newline at end of file
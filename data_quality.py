@@ -5,15 +5,190 @@ Implements data quality checks using Great Expectations
 
 import great_expectations as gx
 from great_expectations.checkpoint import SimpleCheckpoint
+import math
+import numpy as np
 import pandas as pd
+import polars as pl
 import boto3
+from sklearn.decomposition import PCA
 from typing import Dict, List
 
+# Smoothing added to every histogram bin before computing KL divergence
+KL_EPSILON = 1e-6
+
+# Uniform bins used to histogram numeric columns for drift
+NUMERIC_DRIFT_BINS = 70
+
+# Known category sets for the streaming drift histograms
+EVENT_TYPES = ["page_view", "add_to_cart", "purchase", "search", "ad_click"]
+DEVICE_TYPES = ["mobile", "desktop", "tablet"]
+PRODUCT_CATEGORIES = ["Electronics", "Clothing", "Books", "Home", "Sports"]
+
+# Core data expectations, shared by the GE suite and the vectorized validator
+SHOPPER_EVENT_EXPECTATIONS = [
+    # Required fields should not be null
+    {"expectation_type": "expect_column_values_to_not_be_null", "kwargs": {"column": "event_id"}},
+    {"expectation_type": "expect_column_values_to_not_be_null", "kwargs": {"column": "user_id"}},
+    {"expectation_type": "expect_column_values_to_not_be_null", "kwargs": {"column": "timestamp"}},
+    
+    # Event types should be valid
+    {"expectation_type": "expect_column_values_to_be_in_set", 
+     "kwargs": {"column": "event_type", "value_set": EVENT_TYPES}},
+    
+    # Price should be positive
+    {"expectation_type": "expect_column_values_to_be_between", 
+     "kwargs": {"column": "price", "min_value": 0, "max_value": 10000}},
+    
+    # Revenue should be non-negative
+    {"expectation_type": "expect_column_values_to_be_between", 
+     "kwargs": {"column": "revenue", "min_value": 0}},
+    
+    # Device type validation
+    {"expectation_type": "expect_column_values_to_be_in_set", 
+     "kwargs": {"column": "device_type", "value_set": DEVICE_TYPES}},
+    
+    # Data freshness - events should be recent
+    {"expectation_type": "expect_column_values_to_be_between", 
+     "kwargs": {"column": "timestamp", "min_value": "2024-01-01", "parse_strings_as_datetimes": True}},
+]
+
+
+def _expectation_mask(df: pd.DataFrame, expectation: Dict) -> pd.Series:
+    """Vectorized boolean mask of rows passing an expectation (nulls pass value checks, as in GE)"""
+    kwargs = expectation["kwargs"]
+    values = df[kwargs["column"]]
+    expectation_type = expectation["expectation_type"]
+    
+    if expectation_type == "expect_column_values_to_not_be_null":
+        return values.notna()
+    
+    if expectation_type == "expect_column_values_to_be_in_set":
+        return values.isin(kwargs["value_set"]) | values.isna()
+    
+    if expectation_type == "expect_column_values_to_be_between":
+        min_value, max_value = kwargs.get("min_value"), kwargs.get("max_value")
+        if kwargs.get("parse_strings_as_datetimes"):
+            # Unparseable strings become NaT and fail the check
+            values = pd.to_datetime(values, errors="coerce", utc=True)
+            min_value = pd.Timestamp(min_value, tz="UTC") if min_value is not None else None
+            max_value = pd.Timestamp(max_value, tz="UTC") if max_value is not None else None
+        
+        mask = values.notna()
+        if min_value is not None:
+            mask &= values >= min_value
+        if max_value is not None:
+            mask &= values <= max_value
+        return mask | df[kwargs["column"]].isna()
+    
+    raise ValueError(f"Unsupported expectation type: {expectation_type}")
+
+
+def symmetric_kl(p: np.ndarray, q: np.ndarray) -> float:
+    """KL(p||q) + KL(q||p) of two histograms (counts or probabilities).
+    Both are normalized before epsilon-smoothing so the smoothing is scale-independent."""
+    p = np.asarray(p, dtype=float)
+    q = np.asarray(q, dtype=float)
+    p = p / p.sum() + KL_EPSILON
+    q = q / q.sum() + KL_EPSILON
+    p /= p.sum()
+    q /= q.sum()
+    return float(np.sum(p * np.log(p / q)) + np.sum(q * np.log(q / p)))
+
+
+def numeric_symmetric_kl(current: np.ndarray, reference: np.ndarray) -> float:
+    """Symmetric KL between two samples histogrammed on shared uniform bins"""
+    lo = min(current.min(), reference.min())
+    hi = max(current.max(), reference.max())
+    p, _ = np.histogram(current, bins=NUMERIC_DRIFT_BINS, range=(lo, hi))
+    q, _ = np.histogram(reference, bins=NUMERIC_DRIFT_BINS, range=(lo, hi))
+    return symmetric_kl(p, q)
+
+
+def required_window_size(num_bins: int, delta: float) -> int:
+    """Batch size W >= 2 log K / delta^2 needed to detect a KL shift of delta (Sanov bound)"""
+    return math.ceil(2 * math.log(num_bins) / delta ** 2)
+
+
+class StreamingDriftMonitor:
+    """Online drift detection using EMA reference histograms and KL z-scores"""
+    
+    def __init__(self, categories: Dict[str, List[str]] = None, alpha: float = 0.05,
+                 z_threshold: float = 3.0, warmup_batches: int = 5, delta: float = 0.1):
+        self.categories = categories or {
+            'event_type': EVENT_TYPES,
+            'device_type': DEVICE_TYPES,
+            'category': PRODUCT_CATEGORIES,
+        }
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup_batches = warmup_batches
+        
+        # Smallest batch that can resolve a KL shift of delta over each column's bins (+1 'other' bin)
+        self.min_batch_size = {
+            column: required_window_size(len(values) + 1, delta)
+            for column, values in self.categories.items()
+        }
+        
+        # Per column: reference histogram (last bin collects unknown values), KL mean/variance
+        self.reference = {column: None for column in self.categories}
+        self.kl_mean = {column: 0.0 for column in self.categories}
+        self.kl_var = {column: 0.0 for column in self.categories}
+        self.batches = {column: 0 for column in self.categories}
+    
+    def _histogram(self, values: pd.Series, column: str) -> np.ndarray:
+        """Normalized histogram over the known categories plus an 'other' bin"""
+        counts = values.value_counts().reindex(self.categories[column], fill_value=0).to_numpy()
+        hist = np.append(counts, len(values) - counts.sum()).astype(float)
+        return hist / hist.sum()
+    
+    def update(self, batch_df: pd.DataFrame) -> Dict:
+        """Score a batch against the reference histograms, then fold it in"""
+        drift_metrics = {}
+        
+        for column in self.categories:
+            if column not in batch_df.columns or batch_df[column].empty:
+                continue
+            
+            # Too few events to separate drift from sampling noise: flag and leave state untouched
+            if len(batch_df[column]) < self.min_batch_size[column]:
+                drift_metrics[f'{column}_undersized_batch'] = True
+                continue
+            
+            p = self._histogram(batch_df[column], column)
+            q = self.reference[column]
+            if q is None:
+                self.reference[column] = p
+                continue
+            
+            kl_div = symmetric_kl(p, q)
+            
+            # Standardize against the running KL statistics before updating them
+            sigma = math.sqrt(self.kl_var[column])
+            warmed_up = self.batches[column] >= self.warmup_batches
+            z_score = abs(kl_div - self.kl_mean[column]) / sigma if warmed_up and sigma > 0 else 0.0
+            
+            a = self.alpha
+            if self.batches[column] == 0:
+                self.kl_mean[column] = kl_div
+            else:
+                self.kl_mean[column] = (1 - a) * self.kl_mean[column] + a * kl_div
+                self.kl_var[column] = (1 - a) * self.kl_var[column] + a * (kl_div - self.kl_mean[column]) ** 2
+            self.reference[column] = (1 - a) * q + a * p
+            self.batches[column] += 1
+            
+            drift_metrics[f'{column}_kl_divergence'] = kl_div
+            drift_metrics[f'{column}_drift_zscore'] = z_score
+            drift_metrics[f'{column}_drift_alert'] = z_score > self.z_threshold
+        
+        return drift_metrics
+
+
 class DataQualityMonitor:
     def __init__(self, s3_bucket: str):
         self.context = gx.get_context()
         self.s3_bucket = s3_bucket
         self.s3_client = boto3.client('s3')
+        self.drift_monitor = StreamingDriftMonitor()
     
     def create_expectations_suite(self):
         """Create data quality expectations for shopper events"""
@@ -23,35 +198,7 @@ class DataQualityMonitor:
             overwrite_existing=True
         )
         
-        # Core data expectations
-        expectations = [
-            # Required fields should not be null
-            {"expectation_type": "expect_column_values_to_not_be_null", "kwargs": {"column": "event_id"}},
-            {"expectation_type": "expect_column_values_to_not_be_null", "kwargs": {"column": "user_id"}},
-            {"expectation_type": "expect_column_values_to_not_be_null", "kwargs": {"column": "timestamp"}},
-            
-            # Event types should be valid
-            {"expectation_type": "expect_column_values_to_be_in_set", 
-             "kwargs": {"column": "event_type", "value_set": ["page_view", "add_to_cart", "purchase", "search", "ad_click"]}},
-            
-            # Price should be positive
-            {"expectation_type": "expect_column_values_to_be_between", 
-             "kwargs": {"column": "price", "min_value": 0, "max_value": 10000}},
-            
-            # Revenue should be non-negative
-            {"expectation_type": "expect_column_values_to_be_between", 
-             "kwargs": {"column": "revenue", "min_value": 0}},
-            
-            # Device type validation
-            {"expectation_type": "expect_column_values_to_be_in_set", 
-             "kwargs": {"column": "device_type", "value_set": ["mobile", "desktop", "tablet"]}},
-            
-            # Data freshness - events should be recent
-            {"expectation_type": "expect_column_values_to_be_between", 
-             "kwargs": {"column": "timestamp", "min_value": "2024-01-01", "parse_strings_as_datetimes": True}},
-        ]
-        
-        for expectation in expectations:
+        for expectation in SHOPPER_EVENT_EXPECTATIONS:
             suite.add_expectation(**expectation)
         
         self.context.save_expectation_suite(suite)
@@ -85,6 +232,34 @@ class DataQualityMonitor:
             ]
         }
     
+    def validate_batch_fast(self, df: pd.DataFrame) -> Dict:
+        """Validate a streaming batch with vectorized pandas checks instead of Great Expectations"""
+        
+        failed_expectations = []
+        for expectation in SHOPPER_EVENT_EXPECTATIONS:
+            column = expectation["kwargs"]["column"]
+            if column not in df.columns:
+                unexpected_count = len(df)
+            else:
+                unexpected_count = int((~_expectation_mask(df, expectation)).sum())
+            
+            if unexpected_count > 0:
+                failed_expectations.append({
+                    'expectation_config': expectation,
+                    'result': {'unexpected_count': unexpected_count}
+                })
+        
+        evaluated = len(SHOPPER_EVENT_EXPECTATIONS)
+        return {
+            'success': not failed_expectations,
+            'statistics': {
+                'evaluated_expectations': evaluated,
+                'successful_expectations': evaluated - len(failed_expectations),
+                'unsuccessful_expectations': len(failed_expectations)
+            },
+            'failed_expectations': failed_expectations
+        }
+    
     def generate_data_docs(self):
         """Generate data documentation"""
         self.context.build_data_docs()
@@ -104,39 +279,78 @@ class DataQualityMonitor:
                 drift_percentage = abs(current_mean - reference_mean) / reference_mean * 100
                 drift_metrics[f'{column}_drift_pct'] = drift_percentage
         
-        # Compare categorical distributions
-        for column in ['event_type', 'device_type', 'category']:
-            if column in current_df.columns and column in reference_df.columns:
-                current_dist = current_df[column].value_counts(normalize=True)
-                reference_dist = reference_df[column].value_counts(normalize=True)
+        # Compare numeric distributions on shared uniform bins
+        numeric_columns = [
+            column for column in ['price', 'revenue']
+            if column in current_df.columns and column in reference_df.columns
+        ]
+        for column in numeric_columns:
+            current_values = current_df[column].dropna().to_numpy(dtype=float)
+            reference_values = reference_df[column].dropna().to_numpy(dtype=float)
+            if len(current_values) and len(reference_values):
+                drift_metrics[f'{column}_kl_divergence'] = numeric_symmetric_kl(current_values, reference_values)
+        
+        # Joint numeric drift: fit PCA on the reference, weight per-component KL by explained variance
+        if len(numeric_columns) == 2:
+            reference_matrix = reference_df[numeric_columns].dropna().to_numpy(dtype=float)
+            current_matrix = current_df[numeric_columns].dropna().to_numpy(dtype=float)
+            # A constant reference has no principal directions (explained variance ratio is NaN)
+            if len(reference_matrix) >= 2 and len(current_matrix) and reference_matrix.var(axis=0).sum() > 0:
+                pca = PCA(n_components=2).fit(reference_matrix)
+                reference_components = pca.transform(reference_matrix)
+                current_components = pca.transform(current_matrix)
+                drift_metrics['numeric_pca_kl_divergence'] = float(sum(
+                    ratio * numeric_symmetric_kl(current_components[:, i], reference_components[:, i])
+                    for i, ratio in enumerate(pca.explained_variance_ratio_)
+                ))
+        
+        # Compare categorical distributions with Polars group-bys
+        categorical_columns = [
+            column for column in ['event_type', 'device_type', 'category']
+            if column in current_df.columns and column in reference_df.columns
+        ]
+        if categorical_columns:
+            # Compare as strings so pandas category/object columns and all-null columns join cleanly
+            current_pl = pl.from_pandas(current_df[categorical_columns]).cast(pl.String)
+            reference_pl = pl.from_pandas(reference_df[categorical_columns]).cast(pl.String)
+            
+            for column in categorical_columns:
+                current_dist = current_pl.select(column).drop_nulls().group_by(column).len() \
+                    .select(column, (pl.col('len') / pl.col('len').sum()).alias('p'))
+                reference_dist = reference_pl.select(column).drop_nulls().group_by(column).len() \
+                    .select(column, (pl.col('len') / pl.col('len').sum()).alias('q'))
+                if current_dist.is_empty() or reference_dist.is_empty():
+                    continue
                 
-                # Calculate KL divergence (simplified)
-                common_values = set(current_dist.index) & set(reference_dist.index)
-                if common_values:
-                    kl_div = sum([
-                        current_dist[val] * np.log(current_dist[val] / reference_dist[val])
-                        for val in common_values
-                        if reference_dist[val] > 0
-                    ])
-                    drift_metrics[f'{column}_kl_divergence'] = kl_div
+                # Symmetric KL divergence over the union of categories
+                dists = current_dist.join(reference_dist, on=column, how='full', coalesce=True).fill_null(0.0)
+                drift_metrics[f'{column}_kl_divergence'] = symmetric_kl(
+                    dists['p'].to_numpy(), dists['q'].to_numpy()
+                )
         
         return drift_metrics
+    
+    def monitor_streaming_drift(self, batch_df: pd.DataFrame) -> Dict:
+        """Check a streaming batch for drift against the running reference"""
+        return self.drift_monitor.update(batch_df)
 
-def run_quality_checks(s3_bucket: str, s3_key: str):
+def run_quality_checks(s3_bucket: str, s3_key: str, full_audit: bool = True):
     """Main function to run data quality checks"""
     
     monitor = DataQualityMonitor(s3_bucket)
     
-    # Create expectations suite
-    monitor.create_expectations_suite()
-    
     # Load data from S3
     s3_client = boto3.client('s3')
     obj = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
     df = pd.read_json(obj['Body'])
     
-    # Run validation
-    results = monitor.validate_batch(df)
+    # Run validation: Great Expectations for the periodic full audit,
+    # vectorized checks for streaming batches
+    if full_audit:
+        monitor.create_expectations_suite()
+        results = monitor.validate_batch(df)
+    else:
+        results = monitor.validate_batch_fast(df)
     
     # Print results
     print(f"Validation Success: {results['success']}")
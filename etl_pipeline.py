@@ -3,52 +3,124 @@ ETL Pipeline using PySpark for processing shopper events
 Transforms raw events into analytics-ready format
 """
 
-from pyspark.sql import SparkSession
+import functools
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, SparkSession
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
 import boto3
+from typing import List, Tuple, Union
+
+EVENT_SCHEMA = StructType([
+    StructField("event_id", StringType(), True),
+    StructField("user_id", StringType(), True),
+    StructField("session_id", StringType(), True),
+    StructField("timestamp", TimestampType(), True),
+    StructField("event_type", StringType(), True),
+    StructField("product_id", StringType(), True),
+    StructField("category", StringType(), True),
+    StructField("price", DoubleType(), True),
+    StructField("device_type", StringType(), True),
+    StructField("ad_campaign_id", StringType(), True),
+    StructField("revenue", DoubleType(), True)
+])
+
+
+def _split_s3_path(s3_path: str) -> Tuple[str, str]:
+    """Split s3://bucket/prefix/ into (bucket, prefix)"""
+    bucket, _, prefix = s3_path.replace("s3://", "", 1).partition("/")
+    return bucket, prefix
+
+
+def _is_under(s3_path: str, s3_root: str) -> bool:
+    """True if s3_path is s3_root itself or nested below it"""
+    bucket, prefix = _split_s3_path(s3_path)
+    root_bucket, root_prefix = _split_s3_path(s3_root)
+    root_prefix = root_prefix.rstrip("/")
+    return bucket == root_bucket and (
+        not root_prefix or prefix.rstrip("/") == root_prefix or prefix.startswith(root_prefix + "/")
+    )
 
 class ShopperETLPipeline:
     def __init__(self):
         self.spark = SparkSession.builder \
             .appName("ShopperAnalyticsETL") \
             .config("spark.sql.adaptive.enabled", "true") \
+            .config("spark.sql.adaptive.skewJoin.enabled", "true") \
+            .config("spark.jars.packages", "io.github.spark-redshift-community:spark-redshift_2.12:6.2.0-spark_3.5") \
             .getOrCreate()
     
-    def extract_from_s3(self, s3_path: str):
-        """Extract raw events from S3"""
-        schema = StructType([
-            StructField("event_id", StringType(), True),
-            StructField("user_id", StringType(), True),
-            StructField("session_id", StringType(), True),
-            StructField("timestamp", TimestampType(), True),
-            StructField("event_type", StringType(), True),
-            StructField("product_id", StringType(), True),
-            StructField("category", StringType(), True),
-            StructField("price", DoubleType(), True),
-            StructField("device_type", StringType(), True),
-            StructField("ad_campaign_id", StringType(), True),
-            StructField("revenue", DoubleType(), True)
-        ])
-        
-        df = self.spark.read.json(s3_path, schema=schema)
-        return df
+    def extract_from_s3(self, s3_path: Union[str, List[str]], file_format: str = "parquet"):
+        """Extract raw events from S3 (columnar Parquet batches or landed JSON)"""
+        if file_format == "json":
+            return self.spark.read.json(s3_path, schema=EVENT_SCHEMA, mode="DROPMALFORMED")
+        
+        # Read each date-partitioned Parquet root on its own: Spark only honours a streaming
+        # sink's _spark_metadata log for a single path, and roots can't share partition discovery
+        paths = [s3_path] if isinstance(s3_path, str) else s3_path
+        dfs = [
+            self.spark.read.schema(EVENT_SCHEMA).parquet(path).select(*EVENT_SCHEMA.fieldNames())
+            for path in paths
+        ]
+        return functools.reduce(DataFrame.unionByName, dfs)
+    
+    def compact_landing(self, s3_landing_path: str, s3_raw_path: str, s3_archive_path: str,
+                        s3_checkpoint_path: str) -> int:
+        """Compact newly landed JSON into date-partitioned snappy Parquet exactly once.
+        
+        Runs the landing prefix as a file stream until it is drained; the checkpoint
+        records which files were committed and Spark moves them to the archive prefix,
+        so a failed run is resumed instead of appending the same files twice.
+        """
+        for name, path in (("s3_raw_path", s3_raw_path), ("s3_archive_path", s3_archive_path),
+                           ("s3_checkpoint_path", s3_checkpoint_path)):
+            if _is_under(path, s3_landing_path):
+                raise ValueError(f"{name} {path} must not be inside s3_landing_path {s3_landing_path}")
+        
+        landing_df = self.spark.readStream \
+            .schema(EVENT_SCHEMA) \
+            .option("mode", "DROPMALFORMED") \
+            .option("pathGlobFilter", "*.json") \
+            .option("cleanSource", "archive") \
+            .option("sourceArchiveDir", s3_archive_path) \
+            .json(s3_landing_path)
+        
+        # Drop year=/month=/day=/hour= columns Spark discovers from the Lambda's key layout
+        query = landing_df \
+            .select(*EVENT_SCHEMA.fieldNames()) \
+            .withColumn("date", to_date(col("timestamp"))) \
+            .writeStream \
+            .format("parquet") \
+            .partitionBy("date") \
+            .option("compression", "snappy") \
+            .option("checkpointLocation", s3_checkpoint_path) \
+            .trigger(availableNow=True) \
+            .start(s3_raw_path)
+        query.awaitTermination()
+        
+        rows = 0
+        for progress in query.recentProgress:
+            rows += progress["numInputRows"]
+        
+        print(f"Compacted {rows} events from {s3_landing_path} to {s3_raw_path}")
+        return rows
     
     def transform_events(self, raw_df):
-        """Transform raw events for analytics"""
+        """Transform raw events for analytics (persist raw_df first; every output re-reads it)"""
         
         # Add derived columns
         transformed_df = raw_df \
             .withColumn("date", to_date(col("timestamp"))) \
-            .withColumn("hour", hour(col("timestamp"))) \
-            .withColumn("is_purchase", when(col("event_type") == "purchase", 1).otherwise(0)) \
-            .withColumn("is_ad_driven", when(col("ad_campaign_id").isNotNull(), 1).otherwise(0))
+            .withColumn("hour", hour(col("timestamp")))
+        
+        # Purchase flag is computed inside the aggregations to keep cached and shuffled rows narrow
+        is_purchase = when(col("event_type") == "purchase", 1).otherwise(0)
         
-        # Create user session metrics
+        # Create user session metrics (map-side partial aggregation keeps the shuffle small)
         session_metrics = transformed_df.groupBy("user_id", "session_id", "date") \
             .agg(
                 count("*").alias("total_events"),
-                sum("is_purchase").alias("purchases"),
+                sum(is_purchase).alias("purchases"),
                 sum("revenue").alias("session_revenue"),
                 countDistinct("product_id").alias("unique_products_viewed"),
                 first("device_type").alias("device_type")
@@ -58,7 +130,7 @@ class ShopperETLPipeline:
         product_metrics = transformed_df.groupBy("product_id", "category", "date") \
             .agg(
                 count("*").alias("total_views"),
-                sum("is_purchase").alias("total_purchases"),
+                sum(is_purchase).alias("total_purchases"),
                 sum("revenue").alias("total_revenue"),
                 avg("price").alias("avg_price")
             ) \
@@ -66,52 +138,95 @@ class ShopperETLPipeline:
                        when(col("total_views") > 0, col("total_purchases") / col("total_views"))
                        .otherwise(0))
         
+        # Re-attach the event flags on the events output only, keeping analytics.events'
+        # column order for the positional Parquet COPY
+        events = transformed_df \
+            .withColumn("is_purchase", is_purchase) \
+            .withColumn("is_ad_driven", when(col("ad_campaign_id").isNotNull(), 1).otherwise(0))
+        
         return {
-            'events': transformed_df,
+            'events': events,
             'session_metrics': session_metrics,
             'product_metrics': product_metrics
         }
     
     def load_to_redshift(self, dataframes: dict, redshift_config: dict):
-        """Load transformed data to Redshift"""
+        """Load transformed data to Redshift via S3 staging and COPY"""
         
         for table_name, df in dataframes.items():
+            # The connector unloads the DataFrame to tempdir in parallel and
+            # issues a single COPY, which Redshift spreads across slices
             df.write \
-                .format("jdbc") \
+                .format("io.github.spark_redshift_community.spark.redshift") \
                 .option("url", redshift_config['url']) \
                 .option("dbtable", f"analytics.{table_name}") \
                 .option("user", redshift_config['user']) \
                 .option("password", redshift_config['password']) \
-                .option("driver", "com.amazon.redshift.jdbc.Driver") \
+                .option("tempdir", redshift_config['tempdir']) \
+                .option("tempformat", "PARQUET") \
+                .option("aws_iam_role", redshift_config['iam_role']) \
                 .mode("append") \
                 .save()
             
-            print(f"Loaded {df.count()} records to {table_name}")
+            print(f"Loaded {table_name} via COPY from {redshift_config['tempdir']}")
     
-    def run_etl(self, s3_input_path: str, redshift_config: dict):
-        """Execute complete ETL pipeline"""
+    def write_to_s3(self, dataframes: dict, s3_output_path: str):
+        """Write transformed data to S3 as Parquet partitioned by date"""
         
-        # Extract
-        print("Extracting data from S3...")
-        raw_df = self.extract_from_s3(s3_input_path)
+        for table_name, df in dataframes.items():
+            df.write \
+                .partitionBy("date") \
+                .mode("append") \
+                .parquet(f"{s3_output_path.rstrip('/')}/{table_name}/")
+            
+            print(f"Wrote {table_name} to {s3_output_path}")
+    
+    def run_etl(self, s3_input_path: str, redshift_config: dict, s3_output_path: str = None,
+                s3_landing_path: str = None, s3_archive_path: str = None, s3_checkpoint_path: str = None,
+                s3_batch_path: str = None):
+        """Execute complete ETL pipeline (s3_batch_path: Parquet batches from write_batch_to_s3)"""
         
-        # Transform
-        print("Transforming data...")
-        transformed_data = self.transform_events(raw_df)
+        # Compact newly landed JSON into the Parquet raw path
+        if s3_landing_path:
+            if not s3_archive_path or not s3_checkpoint_path:
+                raise ValueError("s3_archive_path and s3_checkpoint_path are required when compacting s3_landing_path")
+            print("Compacting landed JSON to Parquet...")
+            self.compact_landing(s3_landing_path, s3_input_path, s3_archive_path, s3_checkpoint_path)
         
-        # Data quality checks
-        self.validate_data_quality(transformed_data['events'])
+        # Extract
+        print("Extracting data from S3...")
+        raw_df = self.extract_from_s3([s3_input_path, s3_batch_path] if s3_batch_path else s3_input_path) \
+            .persist(StorageLevel.MEMORY_AND_DISK)
         
-        # Load
-        print("Loading to Redshift...")
-        self.load_to_redshift(transformed_data, redshift_config)
+        try:
+            # Transform
+            print("Transforming data...")
+            transformed_data = self.transform_events(raw_df)
+            
+            # Data quality checks
+            self.validate_data_quality(transformed_data['events'])
+            
+            # Load
+            if s3_output_path:
+                print("Writing to S3...")
+                self.write_to_s3(transformed_data, s3_output_path)
+            
+            print("Loading to Redshift...")
+            self.load_to_redshift(transformed_data, redshift_config)
+        finally:
+            raw_df.unpersist()
         
         print("ETL pipeline completed successfully!")
     
     def validate_data_quality(self, df):
         """Basic data quality validation"""
-        total_records = df.count()
-        null_user_ids = df.filter(col("user_id").isNull()).count()
+        # Single pass for both counts
+        row = df.agg(
+            count("*").alias("total"),
+            sum(col("user_id").isNull().cast("int")).alias("nulls")
+        ).collect()[0]
+        total_records = row["total"]
+        null_user_ids = row["nulls"] or 0
         
         if null_user_ids > 0:
             print(f"Warning: {null_user_ids} records with null user_id")
@@ -128,8 +243,14 @@ if __name__ == "__main__":
     redshift_config = {
         'url': 'jdbc:redshift://your-cluster.redshift.amazonaws.com:5439/analytics',
         'user': 'your_user',
-        'password': 'your_password'
+        'password': 'your_password',
+        'tempdir': 's3://your-bucket/redshift-staging/',
+        'iam_role': 'arn:aws:iam::123456789012:role/RedshiftCopyRole'
     }
     
     # Run ETL
-    etl.run_etl('s3://your-bucket/raw-events/', redshift_config)
\ No newline at end of file
+    etl.run_etl('s3://your-bucket/raw-events/', redshift_config,
+                s3_landing_path='s3://your-bucket/landing-events/',
+                s3_archive_path='s3://your-bucket/landing-archive/',
+                s3_checkpoint_path='s3://your-bucket/checkpoints/compact-landing/',
+                s3_batch_path='s3://your-bucket/generated-events/')
\ No newline at end of file